@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Prueba de carga del servidor API
+────────────────────────────────
+Envía N exámenes a servidor_api.py con C clientes simultáneos, espera a que
+terminen, descarga cada Excel e informa de peticiones/segundo y latencia p95
+por endpoint.
+
+Ejemplo de uso
+--------------
+python carga_api.py --preguntas "Test nº2 T11.pdf" \
+                    --respuestas "Test nº2 T11_Tabla.pdf" \
+                    --trabajos 50 --concurrencia 8
+"""
+
+import argparse
+import base64
+import http.client
+import json
+import statistics
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+def peticion(url, cuerpo=None):
+    """
+    Hace una petición y devuelve (código HTTP, bytes, segundos). Los fallos de
+    conexión (rechazo, reset, timeout) no cortan la prueba: devuelven código
+    None y el nombre del error en lugar de los bytes.
+    """
+    req = urllib.request.Request(url, data=cuerpo, method="POST" if cuerpo else "GET")
+    if cuerpo:
+        req.add_header("Content-Type", "application/json")
+    inicio = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=300) as r:
+            datos = r.read()
+            codigo = r.status
+    except urllib.error.HTTPError as e:
+        datos = e.read()
+        codigo = e.code
+    except (OSError, http.client.HTTPException) as e:
+        motivo = getattr(e, "reason", None)  # URLError envuelve el error real
+        datos = type(motivo if isinstance(motivo, BaseException) else e).__name__
+        codigo = None
+    return codigo, datos, time.perf_counter() - inicio
+
+def p95(valores):
+    if len(valores) < 2:
+        return valores[0] if valores else 0.0
+    return statistics.quantiles(valores, n=20)[-1]
+
+def medir(endpoint, url, latencias, fallidas, cuerpo=None, esperado=200):
+    """Lanza la petición y anota su latencia; si falla, la cuenta en `fallidas`."""
+    codigo, datos, t = peticion(url, cuerpo)
+    latencias[endpoint].append(t)
+    if codigo != esperado:
+        fallidas[endpoint].append(t)
+        return None, f"{endpoint} {codigo if codigo is not None else datos}"
+    return datos, None
+
+def ejecutar_trabajo(base, cuerpo, intervalo, latencias, fallidas):
+    """Ciclo completo de un cliente: submit → sondeo de estado → descarga."""
+    datos, fallo = medir("submit", f"{base}/trabajos", latencias, fallidas, cuerpo, esperado=202)
+    if fallo:
+        return fallo
+    id_trabajo = json.loads(datos)["id"]
+
+    while True:
+        datos, fallo = medir("estado", f"{base}/trabajos/{id_trabajo}", latencias, fallidas)
+        if fallo:
+            return fallo
+        estado = json.loads(datos)["estado"]
+        if estado == "completado":
+            break
+        if estado == "error":
+            return "error en pipeline"
+        time.sleep(intervalo)
+
+    _, fallo = medir("excel", f"{base}/trabajos/{id_trabajo}/excel", latencias, fallidas)
+    return fallo
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga para servidor_api.py.")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="URL base del servidor")
+    parser.add_argument("--preguntas", required=True, help="Ruta al PDF de preguntas")
+    parser.add_argument("--respuestas", required=True, help="Ruta al PDF de respuestas + aclaraciones")
+    parser.add_argument("--tema", help="Número de Tema (opcional)")
+    parser.add_argument("--trabajos", type=int, default=20, help="Número total de exámenes a enviar")
+    parser.add_argument("--concurrencia", type=int, default=4, help="Clientes simultáneos")
+    parser.add_argument("--intervalo", type=float, default=0.2, help="Segundos entre consultas de estado")
+    args = parser.parse_args()
+
+    cuerpo = json.dumps({
+        "preguntas": base64.b64encode(Path(args.preguntas).read_bytes()).decode("ascii"),
+        "respuestas": base64.b64encode(Path(args.respuestas).read_bytes()).decode("ascii"),
+        "tema": args.tema,
+    }).encode("utf-8")
+
+    latencias = defaultdict(list)  # list.append es atómico con el GIL
+    fallidas = defaultdict(list)   # latencias de las peticiones fallidas
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrencia) as pool:
+        resultados = list(pool.map(
+            lambda _: ejecutar_trabajo(args.url, cuerpo, args.intervalo, latencias, fallidas),
+            range(args.trabajos),
+        ))
+    total = time.perf_counter() - inicio
+
+    fallos = [r for r in resultados if r]
+    n_peticiones = sum(len(v) for v in latencias.values())
+    n_fallidas = sum(len(v) for v in fallidas.values())
+    print("--- Resultado de la prueba de carga ---")
+    print(f"Trabajos: {args.trabajos} ({len(fallos)} fallidos) | Concurrencia: {args.concurrencia}")
+    print(f"Tiempo total: {total:.2f} s | Trabajos/s: {args.trabajos / total:.2f}")
+    print(f"Peticiones: {n_peticiones} ({n_fallidas} fallidas) | Peticiones/s: {n_peticiones / total:.2f}")
+    for endpoint in ("submit", "estado", "excel"):
+        valores = latencias[endpoint]
+        if valores:
+            print(f"  {endpoint:<7} n={len(valores):<5} fallidas={len(fallidas[endpoint]):<4} "
+                  f"media={statistics.mean(valores) * 1000:8.1f} ms  p95={p95(valores) * 1000:8.1f} ms")
+    for f in sorted(set(fallos)):
+        print(f"  ❌ {f}: {fallos.count(f)}")
+
+if __name__ == "__main__":
+    main()
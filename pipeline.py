@@ -0,0 +1,575 @@
+# -*- coding: utf-8 -*-
+"""
+Pipeline
+────────
+Núcleo común del procesamiento de exámenes, usado por excel_mapper.py (CLI),
+app_streamlit.py (web) y servidor_api.py (HTTP).
+
+PDFs ──extractor──▶ texto ──parser──▶ preguntas/respuestas ──aclaraciones──▶ DataFrame ──escritor──▶ xlsx
+
+Cada etapa es un callable que se puede sustituir al crear el Pipeline:
+
+    extractor(fuente) -> str                       fuente: ruta, bytes o fichero abierto
+    parser(texto_p, texto_r) -> (preguntas, respuestas, aclaraciones)
+    aclaraciones(texto_r, preguntas, id_trabajo, bloques) -> {nº: aclaración}
+    escritor(df, destino)                          destino: ruta o buffer
+
+Ejemplo
+-------
+pipeline = Pipeline(aclaraciones=AclaracionesOpenAI(modelo="gpt-4.1-mini"))
+df = pipeline.procesar("preguntas.pdf", "respuestas.pdf", tema_num=11)
+pipeline.escribir(df, "OUTPUT.xlsx")
+"""
+
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import fitz  # PyMuPDF
+import pandas as pd
+from openai import OpenAI
+
+from registro_llm import debe_registrar, registrar_traza, registro_activo
+
+# =========================
+# 1) extracción de texto
+# =========================
+# PyMuPDF no admite uso multihilo: toda llamada a fitz pasa por este lock.
+_LOCK_FITZ = threading.Lock()
+
+def extraer_texto(fuente) -> str:
+    """
+    Devuelve todo el texto del PDF con saltos de línea preservados.
+    `fuente` puede ser una ruta, los bytes del PDF o un fichero abierto
+    (p. ej. el UploadedFile de Streamlit).
+    """
+    if hasattr(fuente, "read"):
+        fuente = fuente.read()
+    with _LOCK_FITZ:
+        if isinstance(fuente, (bytes, bytearray)):
+            doc = fitz.open(stream=fuente, filetype="pdf")
+        else:
+            doc = fitz.open(Path(fuente))
+        with doc:
+            return "\n".join(p.get_text(sort=True) for p in doc)  # sort=True → orden natural
+
+def normalizar_saltos(texto: str) -> str:
+    """Unifica saltos de línea \r\n / \r / \n en solo \n."""
+    return texto.replace("\r\n", "\n").replace("\r", "\n")
+
+def normalizar_saltos_limpio(texto: str) -> str:
+    """
+    Como normalizar_saltos, pero además recorta cada línea, colapsa espacios
+    internos y deja como máximo una línea en blanco seguida.
+    """
+    lineas = normalizar_saltos(texto).split("\n")
+    texto_limpio = "\n".join(re.sub(r"\s+", " ", l.strip()) for l in lineas)
+    # Eliminar múltiples saltos de línea consecutivos (más de 2)
+    return re.sub(r"\n{3,}", "\n\n", texto_limpio)
+
+# =========================
+# 2) parsing de preguntas
+# =========================
+def obtener_preguntas(texto_preguntas: str):
+    """
+    Devuelve lista de tuplas:
+      (nº, enunciado, A, B, C, D)
+    Literalidad absoluta, tolerando saltos de línea en enunciado y opciones.
+    """
+    lineas = [l.rstrip() for l in texto_preguntas.splitlines()]
+    preguntas = []
+    i = 0
+    while i < len(lineas):
+        # Buscar inicio de pregunta: número punto espacio
+        if lineas[i].strip().startswith(tuple(str(n)+'.' for n in range(1, 101))):
+            num_match = re.match(r'^(\d{1,3})\.\s*(.*)', lineas[i].strip())
+            if not num_match:
+                i += 1
+                continue
+            num = int(num_match.group(1))
+            enunciado = num_match.group(2)
+            i += 1
+            # Acumular líneas de enunciado hasta encontrar 'a)'
+            while i < len(lineas) and not re.match(r'^[aA]\)', lineas[i].strip()):
+                if lineas[i].strip():  # Solo agregar líneas no vacías
+                    enunciado += (' ' if enunciado else '') + lineas[i].strip()
+                i += 1
+            # Limpiar espacios extra del enunciado
+            enunciado = re.sub(r'\s+', ' ', enunciado.strip())
+            # Acumular opciones
+            opciones = {}
+            for letra in ['A', 'B', 'C', 'D']:
+                opcion = ''
+                if i < len(lineas) and re.match(rf'^{letra.lower()}\)', lineas[i].strip(), re.IGNORECASE):
+                    op_match = re.match(rf'^{letra.lower()}\)\s*(.*)', lineas[i].strip(), re.IGNORECASE)
+                    opcion = op_match.group(1) if op_match else ''
+                    i += 1
+                    while i < len(lineas):
+                        # Si la siguiente línea es otra opción o una nueva pregunta, paramos
+                        if any(re.match(rf'^{l.lower()}\)', lineas[i].strip(), re.IGNORECASE) for l in ['A','B','C','D'] if l != letra):
+                            break
+                        if re.match(r'^(\d{1,3})\.\s*', lineas[i].strip()):
+                            break
+                        if lineas[i].strip():  # Solo agregar líneas no vacías
+                            opcion += ' ' + lineas[i].strip()
+                        i += 1
+                    # Limpiar espacios extra de la opción
+                    opcion = re.sub(r'\s+', ' ', opcion.strip())
+                opciones[letra] = opcion
+            if all(k in opciones for k in ['A','B','C','D']):
+                preguntas.append((num, enunciado, opciones['A'], opciones['B'], opciones['C'], opciones['D']))
+        else:
+            i += 1
+    return preguntas
+
+# =========================
+# 3) parsing de respuestas
+# =========================
+PATRON_RESPUESTA = re.compile(r'(\b(\d{1,3})\s+([A-F])\b)')  # 1-100, como obtener_preguntas
+
+def obtener_respuestas(texto_respuestas: str):
+    """
+    Devuelve dos diccionarios:
+      respuestas[num]    -> 'A'-'F'
+      aclaraciones[num]  -> texto completo
+    """
+    lineas = [l.rstrip() for l in texto_respuestas.splitlines()]
+    respuestas, aclaraciones = {}, {}
+    patron = PATRON_RESPUESTA
+    bloques = []
+    bloque = []
+    for l in lineas:
+        if patron.search(l):
+            if bloque:
+                bloques.append(bloque)
+            bloque = [l]
+        else:
+            bloque.append(l)
+    if bloque:
+        bloques.append(bloque)
+    for b in bloques:
+        # Buscar número y letra
+        m = patron.search(b[0])
+        if m:
+            n = int(m.group(2))
+            letra = m.group(3)
+            respuestas[n] = letra
+            # La aclaración es todo el bloque menos la primera línea
+            aclaraciones[n] = "\n".join(b[1:]).strip()
+    return respuestas, aclaraciones
+
+def parsear_examen(texto_preguntas: str, texto_respuestas: str):
+    """Parser por defecto: devuelve (preguntas, respuestas, aclaraciones)."""
+    preguntas = obtener_preguntas(texto_preguntas)
+    respuestas, aclaraciones = obtener_respuestas(texto_respuestas)
+    return preguntas, respuestas, aclaraciones
+
+# =========================
+# 4) aclaraciones con LLM
+# =========================
+CHARS_POR_TOKEN = 3.5       # texto en español, aproximado
+TOKENS_POR_ENTRADA = 8      # clave, comillas y comas del JSON por pregunta
+MARGEN_ESTIMACION = 1.25    # holgura sobre la estimación antes de fijar max_tokens
+MIN_MAX_TOKENS = 512
+
+def estimar_tokens_salida(lista_preguntas, bloques=None, texto_pdf_respuestas="") -> int:
+    """
+    Estima los tokens del JSON de salida a partir de los bloques de aclaración
+    que encontró el parser (regex). Las preguntas sin bloque cuentan como la
+    media; si no hay bloques se usa el tamaño del texto de respuestas.
+    """
+    numeros = [p[0] for p in lista_preguntas]
+    media = _tamano_medio(numeros, bloques)
+    if media is None:
+        return int(len(texto_pdf_respuestas[:80000]) / CHARS_POR_TOKEN) + TOKENS_POR_ENTRADA * len(numeros)
+    return sum(_coste_pregunta(n, bloques, media) for n in numeros)
+
+def _tamano_medio(numeros, bloques):
+    """Longitud media de los bloques de estas preguntas, o None si no hay ninguno."""
+    tamanos = [len(bloques[n]) for n in numeros if bloques and n in bloques]
+    return sum(tamanos) / len(tamanos) if tamanos else None
+
+def _coste_pregunta(n, bloques, media) -> int:
+    """Tokens estimados de una pregunta; sin bloque cuenta como la media."""
+    return int((len(bloques[n]) if n in bloques else media) / CHARS_POR_TOKEN) + TOKENS_POR_ENTRADA
+
+def calcular_max_tokens(tokens_estimados: int, limite: int) -> int:
+    return max(MIN_MAX_TOKENS, min(limite, int(tokens_estimados * MARGEN_ESTIMACION)))
+
+def trocear_examen(texto_pdf_respuestas, lista_preguntas, bloques, tokens_por_llamada):
+    """
+    Reparte las preguntas en trozos consecutivos cuya salida estimada no supere
+    `tokens_por_llamada`. Devuelve [(números, texto del trozo, tokens estimados)].
+    Al trocear, las preguntas cuyo patrón no aparece en el texto se omiten.
+    Cada trozo incluye desde el patrón de la respuesta anterior hasta justo antes
+    del patrón de la siguiente, para no perder la parte "antes" ni la "después".
+    """
+    numeros = [p[0] for p in lista_preguntas]
+    if not numeros:
+        return []
+    total = estimar_tokens_salida(lista_preguntas, bloques, texto_pdf_respuestas)
+    media = _tamano_medio(numeros, bloques)
+    if total <= tokens_por_llamada or media is None:
+        return [(numeros, texto_pdf_respuestas, total)]
+
+    # Posición (línea) del patrón de cada respuesta, en orden de aparición
+    lineas = texto_pdf_respuestas.splitlines()
+    posiciones = {}
+    for i, l in enumerate(lineas):
+        m = PATRON_RESPUESTA.search(l)
+        if m:
+            posiciones.setdefault(int(m.group(2)), i)
+    pendientes = set(numeros)
+    orden = [n for n in posiciones if n in pendientes]
+    sin_posicion = [n for n in numeros if n not in posiciones]
+
+    grupos, grupo, acumulado = [], [], 0
+    for n in orden:
+        coste = _coste_pregunta(n, bloques, media)
+        if grupo and acumulado + coste > tokens_por_llamada:
+            grupos.append((grupo, acumulado))
+            grupo, acumulado = [], 0
+        grupo.append(n)
+        acumulado += coste
+    if grupo:
+        grupos.append((grupo, acumulado))
+
+    trozos = []
+    claves = list(posiciones)
+    for grupo, estimados in grupos:
+        idx_ini, idx_fin = claves.index(grupo[0]), claves.index(grupo[-1])
+        ini = posiciones[claves[idx_ini - 1]] if idx_ini > 0 else 0
+        fin = posiciones[claves[idx_fin + 1]] if idx_fin + 1 < len(claves) else len(lineas)
+        trozos.append((grupo, "\n".join(lineas[ini:fin]), estimados))
+    if sin_posicion:
+        # Sin patrón no se sabe qué parte del texto les corresponde; reenviar el
+        # texto completo devolvería el examen entero. Quedan sin aclaración.
+        print(f"[LLM] ⚠️ Sin patrón de respuesta, se omiten: {', '.join(map(str, sin_posicion))}")
+    return trozos
+
+def construir_prompt(texto_pdf_respuestas, numeros) -> str:
+    numeros_preguntas = [str(n) for n in numeros]
+    if len(numeros_preguntas) <= 15:
+        lista = ', '.join(numeros_preguntas)
+    else:
+        lista = f"{', '.join(numeros_preguntas[:10])}...{', '.join(numeros_preguntas[-5:])}"
+
+    # Prompt mejorado para capturar aclaraciones completas (antes + después del patrón)
+    prompt = f"""
+Extrae las aclaraciones del PDF de respuestas de examen. Devuelve SOLO un JSON válido:
+
+{{"1": "aclaración pregunta 1", "2": "aclaración pregunta 2", ...}}
+
+INSTRUCCIONES CRÍTICAS:
+- Busca el patrón: "NÚMERO + ESPACIOS + LETRA" (ej: "1      D", "2      B")
+- La aclaración de cada pregunta está DIVIDIDA en dos partes:
+  * ANTES del patrón: texto que pertenece a esa pregunta
+  * DESPUÉS del patrón: continuación del texto hasta la siguiente pregunta
+- Combina AMBAS partes para formar la aclaración completa
+- LIMPIA EL FORMATO: elimina espacios extra, tabulaciones y saltos de línea innecesarios
+- Convierte múltiples espacios en uno solo
+- Mantén solo los saltos de línea necesarios para la estructura del texto
+- Copia literal el CONTENIDO pero con formato limpio
+- Si no hay aclaración, usa ""
+- Solo JSON, sin texto extra
+
+EJEMPLO DEL PATRÓN REAL:
+```
+Art. 12 Ley 45/2015 "El acuerdo de incorporación...  ← PARTE 1 (antes)
+     1      D                                        ← PATRÓN
+se requiera para el cumplimiento...convenido."       ← PARTE 2 (después)
+```
+La aclaración completa = PARTE 1 + PARTE 2 (con formato limpio)
+
+Preguntas a procesar: {lista}
+
+PDF:
+{texto_pdf_respuestas[:80000]}"""
+    return prompt
+
+def parsear_json_aclaraciones(contenido: str) -> dict:
+    """Convierte la respuesta del LLM en {nº: aclaración}. Lanza JSONDecodeError si no es JSON."""
+    # Limpiar posibles caracteres extra antes/después del JSON
+    if contenido.startswith('```'):
+        contenido = contenido.split('```')[1]
+    if contenido.startswith('json'):
+        contenido = contenido[4:]
+    contenido = contenido.strip()
+    aclaraciones_json = json.loads(contenido)
+    # Convertir claves a enteros
+    return {int(k): v for k, v in aclaraciones_json.items()}
+
+class ErrorAclaraciones(Exception):
+    """Fallo del backend de aclaraciones cuando se crea con estricto=True."""
+
+def _avisar_consola(mensaje: str):
+    print(f"[LLM] ❌ {mensaje}")
+
+class AclaracionesOpenAI:
+    """
+    Backend de aclaraciones por defecto (OpenAI).
+
+    - max_tokens se ajusta a la salida estimada del examen en lugar de
+      reservar siempre el máximo; si la respuesta se corta por ese límite se
+      reintenta una vez con `max_tokens` completo.
+    - Si la estimación supera `tokens_por_llamada`, el examen se trocea y los
+      trozos se piden en paralelo.
+    - Si `modelo_rapido` está configurado y la estimación total no supera
+      `umbral_rapido`, se usa ese modelo en lugar de `modelo`.
+
+    Cada llamada deja en registro_llm los tokens estimados frente a los reales
+    (la traza completa con prompt y respuesta solo si se muestrea). Los
+    errores se notifican con `avisar` desde el hilo que llama; con
+    `estricto=True` se lanza ErrorAclaraciones en lugar de devolver
+    aclaraciones incompletas (modo servidor).
+    """
+
+    def __init__(self, modelo="gpt-4.1-mini", api_key=None, max_tokens=16000, avisar=_avisar_consola,
+                 modelo_rapido=None, umbral_rapido=None, tokens_por_llamada=None, estricto=False):
+        self.modelo = modelo
+        self.max_tokens = max_tokens
+        self.avisar = avisar
+        self.estricto = estricto
+        self.modelo_rapido = modelo_rapido or os.getenv("LLM_MODELO_RAPIDO")
+        self.umbral_rapido = umbral_rapido or int(os.getenv("LLM_UMBRAL_RAPIDO", "3000"))
+        self.tokens_por_llamada = min(max_tokens, tokens_por_llamada or int(os.getenv("LLM_TOKENS_POR_LLAMADA", "12000")))
+        self.client = OpenAI(api_key=api_key or os.getenv("OPENAI_API_KEY"))
+
+    def __call__(self, texto_pdf_respuestas, lista_preguntas, id_trabajo=None, bloques=None):
+        id_trabajo = id_trabajo or uuid.uuid4().hex
+        trozos = trocear_examen(texto_pdf_respuestas, lista_preguntas, bloques, self.tokens_por_llamada)
+        if not trozos:
+            print("[LLM] Sin preguntas que procesar, no se llama al LLM")
+            return {}
+        estimados = sum(t[2] for t in trozos)
+        # Una estimación de 0 significa que no hay datos, no que el examen sea pequeño
+        rapido = self.modelo_rapido and 0 < estimados <= self.umbral_rapido
+        modelo = self.modelo_rapido if rapido else self.modelo
+        print(f"[LLM] Salida estimada: {estimados} tokens → {modelo}, {len(trozos)} llamada(s)")
+
+        if len(trozos) == 1:
+            resultados = [self._llamar(id_trabajo, modelo, *trozos[0], trozo="1/1")]
+        else:
+            with ThreadPoolExecutor(max_workers=min(len(trozos), 4)) as pool:
+                resultados = list(pool.map(
+                    lambda it: self._llamar(id_trabajo, modelo, *it[1], trozo=f"{it[0] + 1}/{len(trozos)}"),
+                    enumerate(trozos),
+                ))
+
+        errores = [error for _, error in resultados if error]
+        if errores and self.estricto:
+            raise ErrorAclaraciones("; ".join(errores))
+        aclaraciones = {}
+        for resultado, error in resultados:
+            if error:
+                self.avisar(error)
+            aclaraciones.update(resultado)
+        if len(trozos) > 1:
+            print(f"[LLM] ✅ Extraídas {len(aclaraciones)} aclaraciones en total")
+        return aclaraciones
+
+    def _llamar(self, id_trabajo, modelo, numeros, texto, tokens_estimados, trozo):
+        """
+        Una llamada al LLM. Devuelve (aclaraciones, mensaje de error o None).
+        Si la respuesta se corta en un max_tokens reducido por la estimación, se
+        reintenta una vez con el máximo (`self.max_tokens`).
+        """
+        registrar = debe_registrar()
+        prompt = construir_prompt(texto, numeros)
+        max_tokens = calcular_max_tokens(tokens_estimados, self.max_tokens)
+        reintento = False
+
+        while True:
+            traza = {"id_trabajo": id_trabajo, "trozo": trozo, "modelo": modelo, "max_tokens": max_tokens,
+                     "tokens_estimados": tokens_estimados, "preguntas": len(numeros), "reintento": reintento}
+            inicio = time.perf_counter()
+            try:
+                respuesta = self.client.chat.completions.create(
+                    model=modelo,
+                    messages=[{"role": "user", "content": prompt}],
+                    max_tokens=max_tokens,
+                    temperature=0.0,
+                )
+            except Exception as e:
+                traza.update({
+                    "ts": time.time(),
+                    "segundos_llm": round(time.perf_counter() - inicio, 3),
+                    "error": str(e),
+                })
+                if registrar:
+                    traza["prompt"] = prompt
+                if registro_activo():
+                    registrar_traza(traza)
+                return {}, f"Error en llamada a OpenAI: {e}"
+
+            try:
+                contenido = respuesta.choices[0].message.content.strip()
+                finish_reason = respuesta.choices[0].finish_reason
+            except (AttributeError, TypeError, IndexError) as e:
+                traza.update({
+                    "ts": time.time(),
+                    "segundos_llm": round(time.perf_counter() - inicio, 3),
+                    "error": f"Respuesta sin contenido: {e}",
+                })
+                if registro_activo():
+                    registrar_traza(traza)
+                return {}, f"Respuesta del LLM sin contenido: {e}"
+            uso = respuesta.usage
+            tokens_reales = getattr(uso, "completion_tokens", None)
+            print(f"[LLM] Respuesta recibida ({trozo}): {len(contenido)} caracteres, "
+                  f"tokens estimados {tokens_estimados} / reales {tokens_reales}")
+
+            # GUARDAR LA TRAZA DEL LLM PARA ANÁLISIS (asíncrono; prompt/respuesta solo si se muestrea)
+            traza.update({
+                "ts": time.time(),
+                "segundos_llm": round(time.perf_counter() - inicio, 3),
+                "tokens_prompt": getattr(uso, "prompt_tokens", None),
+                "tokens_respuesta": tokens_reales,
+                "finish_reason": finish_reason,
+            })
+            if registrar:
+                traza.update({"prompt": prompt, "respuesta": contenido})
+            if registro_activo():
+                registrar_traza(traza)
+
+            if finish_reason == "length" and not reintento and max_tokens < self.max_tokens:
+                print(f"[LLM] ⚠️ Respuesta truncada en max_tokens={max_tokens}, "
+                      f"reintentando con {self.max_tokens}")
+                max_tokens, reintento = self.max_tokens, True
+                continue
+            if finish_reason == "length":
+                print(f"[LLM] ⚠️ Respuesta truncada en max_tokens={max_tokens}")
+            break
+
+        try:
+            resultado = parsear_json_aclaraciones(contenido)
+            # Solo las preguntas de este trozo: el texto incluye los bordes de los vecinos
+            pedidas = set(numeros)
+            resultado = {n: v for n, v in resultado.items() if n in pedidas}
+        except (ValueError, AttributeError, TypeError) as e:  # JSONDecodeError es ValueError
+            print(f"[LLM] Contenido: {contenido[:500]}...")
+            return {}, f"Error parseando JSON del LLM: {e}"
+        print(f"[LLM] ✅ Extraídas {len(resultado)} aclaraciones")
+        return resultado, None
+
+# =========================
+# 5) construcción del Excel
+# =========================
+COLUMNAS = [
+    "Id pregunta para imagen",
+    "Enunciado pregunta",
+    "Texto respuesta A",
+    "Texto respuesta B",
+    "Texto respuesta C",
+    "Texto respuesta D",
+    "Texto respuesta E",
+    "Texto respuesta F",
+    "Respuesta correcta",
+    "Nº Tema",
+    "Nombre Tema",
+    "Nombre de subtema",
+    "Nombre del apartado",
+    "Etiqueta",
+    "Tipo Tema (T o P)",
+    "Aclaración respuesta",
+    "Estado",
+    "Contexto de aclaración",
+]
+
+def construir_filas(pregs, resps, aclaraciones_llm, tema_num):
+    """Monta el DataFrame final a partir de los datos parseados y las aclaraciones."""
+    filas = []
+    for (num, enunciado, a, b, c, d) in pregs:
+        aclaracion = aclaraciones_llm.get(num, "")
+        if not aclaracion:  # Si está vacía, intentar con string
+            aclaracion = aclaraciones_llm.get(str(num), "")
+        
+        filas.append({
+            "Id pregunta para imagen": num,
+            "Enunciado pregunta": enunciado,
+            "Texto respuesta A": a,
+            "Texto respuesta B": b,
+            "Texto respuesta C": c,
+            "Texto respuesta D": d,
+            "Texto respuesta E": "",
+            "Texto respuesta F": "",
+            "Respuesta correcta": resps.get(num, ""),
+            "Nº Tema": tema_num or "",
+            "Nombre Tema": "",
+            "Nombre de subtema": "",
+            "Nombre del apartado": "",
+            "Etiqueta": "",
+            "Tipo Tema (T o P)": "",
+            "Aclaración respuesta": aclaracion if aclaracion else None,
+            "Estado": "Publicada",
+            "Contexto de aclaración": "",
+        })
+    return pd.DataFrame(filas, columns=COLUMNAS)
+
+def escribir_excel(df, destino, hoja="Sheet1"):
+    """Escritor por defecto: `destino` puede ser una ruta o un buffer (BytesIO)."""
+    df.to_excel(destino, index=False, sheet_name=hoja, engine="openpyxl")
+
+# =========================
+# 6) pipeline
+# =========================
+class Pipeline:
+    """
+    Encadena las etapas. Los tiempos de cada etapa quedan en
+    df.attrs["tiempos"] del DataFrame devuelto por procesar().
+    No guarda estado por examen, así que una instancia puede compartirse entre
+    hilos; la extracción con PyMuPDF se serializa con un lock (ver extraer_texto)
+    y solo la etapa de aclaraciones corre realmente en paralelo.
+    """
+
+    def __init__(self, extractor=extraer_texto, normalizador=normalizar_saltos,
+                 parser=parsear_examen, aclaraciones=None, escritor=escribir_excel):
+        self.extractor = extractor
+        self.normalizador = normalizador
+        self.parser = parser
+        self.aclaraciones = aclaraciones or AclaracionesOpenAI()
+        self.escritor = escritor
+
+    def leer(self, fuente) -> str:
+        return self.normalizador(self.extractor(fuente))
+
+    def parsear(self, texto_preguntas: str, texto_respuestas: str):
+        return self.parser(texto_preguntas, texto_respuestas)
+
+    def construir_dataframe(self, preguntas, respuestas, tema_num, texto_respuestas, id_trabajo=None,
+                            bloques=None):
+        """`bloques` son las aclaraciones del parser; el backend las usa para dimensionar la salida."""
+        aclaraciones_llm = self.aclaraciones(texto_respuestas, preguntas, id_trabajo, bloques)
+        return construir_filas(preguntas, respuestas, aclaraciones_llm, tema_num)
+
+    def procesar(self, fuente_preguntas, fuente_respuestas, tema_num=None, id_trabajo=None,
+                 al_parsear=None):
+        """
+        Pipeline completo: fuentes PDF → DataFrame con las 18 columnas.
+        Todos los front-ends pasan por aquí para que los tiempos por etapa se
+        midan igual. `al_parsear(texto_p, texto_r, preguntas, respuestas,
+        aclaraciones)` se llama antes de la etapa LLM, para diagnósticos; si
+        lanza una excepción, el procesamiento se detiene sin llamar al LLM.
+        """
+        tiempos = {}
+        t = time.perf_counter()
+        texto_p = self.leer(fuente_preguntas)
+        texto_r = self.leer(fuente_respuestas)
+        tiempos["extraccion"], t = round(time.perf_counter() - t, 3), time.perf_counter()
+        preguntas, respuestas, aclaraciones = self.parsear(texto_p, texto_r)
+        tiempos["parsing"] = round(time.perf_counter() - t, 3)
+        if al_parsear is not None:
+            al_parsear(texto_p, texto_r, preguntas, respuestas, aclaraciones)
+        t = time.perf_counter()
+        df = self.construir_dataframe(preguntas, respuestas, tema_num, texto_r, id_trabajo, aclaraciones)
+        tiempos["aclaraciones"] = round(time.perf_counter() - t, 3)
+        df.attrs["tiempos"] = tiempos
+        return df
+
+    def escribir(self, df, destino):
+        self.escritor(df, destino)
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+Registro de trazas LLM
+──────────────────────
+Guarda cada llamada al LLM como una línea JSON (id de trabajo, tiempos, uso de
+tokens y tokens estimados) en logs_llm/trazas_llm.<pid>.jsonl. El prompt y la
+respuesta completos solo se añaden en las llamadas muestreadas.
+
+- La escritura y la serialización a JSON se hacen en un hilo aparte
+  (QueueHandler + QueueListener), así que la llamada al LLM solo paga
+  encolar un dict.
+- Cada proceso escribe en su propio fichero (PID en el nombre): la rotación
+  de RotatingFileHandler no es segura con varios procesos sobre el mismo
+  fichero, y la CLI, la web y el servidor pueden compartir directorio.
+- Al arrancar, se borran los ficheros más antiguos de procesos ya terminados
+  hasta que el directorio quede bajo LLM_TRAZAS_TOTAL_MB, para que una
+  ejecución por examen no haga crecer el directorio sin límite.
+- El fichero rota por tamaño y las copias rotadas se comprimen con gzip.
+- El muestreo decide ANTES de construir la traza: las llamadas no
+  muestreadas solo encolan un registro pequeño, sin prompt ni respuesta.
+
+Configuración (variables de entorno o .env)
+-------------------------------------------
+LLM_TRAZAS_DIR        Directorio de salida                (por defecto logs_llm)
+LLM_TRAZAS_MUESTREO   Fracción de llamadas con prompt/respuesta, 0-1 (por defecto 1.0; 0 desactiva todo)
+LLM_TRAZAS_MAX_MB     Tamaño máximo antes de rotar        (por defecto 20)
+LLM_TRAZAS_COPIAS     Copias comprimidas a conservar      (por defecto 5)
+LLM_TRAZAS_TOTAL_MB   Tamaño máximo del directorio        (por defecto 200)
+"""
+
+import atexit
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import shutil
+import threading
+from pathlib import Path
+
+_logger = logging.getLogger("tipo_test.trazas_llm")
+_logger.propagate = False
+_listener = None
+_desactivado = False
+_lock = threading.Lock()
+
+def _muestreo() -> float:
+    try:
+        return min(max(float(os.getenv("LLM_TRAZAS_MUESTREO", "1.0")), 0.0), 1.0)
+    except ValueError:
+        return 1.0
+
+def _namer(nombre: str) -> str:
+    return nombre + ".gz"
+
+def _rotator(origen: str, destino: str):
+    """Comprime la copia rotada con gzip y borra el original."""
+    with open(origen, "rb") as f_in, gzip.open(destino, "wb") as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(origen)
+
+class _FormatoJSON(logging.Formatter):
+    """Serializa la traza (record.msg es el dict) en el hilo escritor."""
+
+    def format(self, record):
+        return json.dumps(record.msg, ensure_ascii=False)
+
+class _QueueHandlerSinFormato(logging.handlers.QueueHandler):
+    """Encola el record tal cual; el QueueHandler estándar lo formatearía en el hilo que llama."""
+
+    def prepare(self, record):
+        return record
+
+def _proceso_vivo(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    if os.name != "posix":
+        # En Windows os.kill(pid, 0) termina el proceso; no se comprueba y el
+        # borrado de un fichero aún abierto falla con OSError (se ignora).
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+def _podar(directorio: Path, max_total: int):
+    """Borra los ficheros más antiguos de procesos terminados hasta quedar bajo `max_total` bytes."""
+    ficheros = []
+    for ruta in directorio.glob("trazas_llm.*.jsonl*"):
+        try:
+            pid = int(ruta.name.split(".")[1])
+            stat = ruta.stat()
+        except (ValueError, IndexError, OSError):
+            continue
+        ficheros.append((stat.st_mtime, stat.st_size, pid, ruta))
+    total = sum(f[1] for f in ficheros)
+    for _, tamano, pid, ruta in sorted(ficheros):
+        if total <= max_total:
+            break
+        if _proceso_vivo(pid):
+            continue
+        try:
+            ruta.unlink()
+            total -= tamano
+        except OSError:
+            pass
+
+def _iniciar():
+    """
+    Crea el handler rotativo y arranca el hilo escritor (una sola vez). Si no
+    se puede (directorio no escribible, configuración inválida), avisa y
+    desactiva el registro: las trazas nunca deben romper el pipeline.
+    """
+    global _listener, _desactivado
+    with _lock:
+        if _listener is not None or _desactivado:
+            return
+        try:
+            _listener = _crear_listener()
+        except (OSError, ValueError) as e:
+            _desactivado = True
+            print(f"[LLM] ⚠️ Trazas desactivadas: {e}")
+            return
+        _listener.start()
+        atexit.register(_listener.stop)  # vacía la cola antes de salir
+
+def _crear_listener():
+    directorio = Path(os.getenv("LLM_TRAZAS_DIR", "logs_llm"))
+    total_mb = float(os.getenv("LLM_TRAZAS_TOTAL_MB", "200"))
+    max_mb = float(os.getenv("LLM_TRAZAS_MAX_MB", "20"))
+    copias = int(os.getenv("LLM_TRAZAS_COPIAS", "5"))
+    directorio.mkdir(parents=True, exist_ok=True)
+    _podar(directorio, int(total_mb * 1024 * 1024))
+    handler = logging.handlers.RotatingFileHandler(
+        directorio / f"trazas_llm.{os.getpid()}.jsonl",
+        maxBytes=int(max_mb * 1024 * 1024),
+        backupCount=copias,
+        encoding="utf-8",
+        delay=True,
+    )
+    handler.namer = _namer
+    handler.rotator = _rotator
+    handler.setFormatter(_FormatoJSON())
+
+    cola = queue.SimpleQueue()
+    _logger.addHandler(_QueueHandlerSinFormato(cola))
+    _logger.setLevel(logging.INFO)
+    return logging.handlers.QueueListener(cola, handler)
+
+def registro_activo() -> bool:
+    """False solo si el registro está desactivado (LLM_TRAZAS_MUESTREO=0)."""
+    return _muestreo() > 0
+
+def debe_registrar() -> bool:
+    """Decide si esta llamada se muestrea. Llamar antes de preparar la traza."""
+    muestreo = _muestreo()
+    return muestreo > 0 and (muestreo >= 1 or random.random() < muestreo)
+
+def registrar_traza(traza: dict):
+    """
+    Encola la traza (dict serializable a JSON) para serializarla y escribirla
+    en segundo plano. No modificar el dict después de encolarlo.
+    """
+    _iniciar()
+    if not _desactivado:
+        _logger.info(traza)
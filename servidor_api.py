@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Servidor API
+────────────
+Modo servidor HTTP (local, sin servicios externos) sobre el mismo pipeline de
+excel_mapper.py, para integraciones que no quieren lanzar un proceso por examen.
+
+Endpoints
+---------
+POST /trabajos                 Envía un examen. Cuerpo JSON:
+                                 {"preguntas": "<PDF en base64>",
+                                  "respuestas": "<PDF en base64>",
+                                  "tema": 11}            (tema opcional)
+                               → 202 {"id": "...", "estado": "pendiente"}
+GET  /trabajos/<id>            Estado del trabajo (pendiente | procesando | completado | error)
+GET  /trabajos/<id>/excel      Descarga el Excel generado (respuesta en streaming)
+GET  /salud                    Comprobación de vida y ocupación del servidor
+
+Ejemplo de uso
+--------------
+python servidor_api.py --puerto 8000 --workers 4 --max-concurrentes 32
+"""
+
+import argparse
+import base64
+import binascii
+import io
+import json
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from excel_mapper import crear_pipeline
+
+MIME_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+TAM_BLOQUE = 64 * 1024          # tamaño de cada trozo al enviar el xlsx
+MAX_CUERPO = 50 * 1024 * 1024   # límite del cuerpo de POST /trabajos
+
+RUTA_TRABAJO = re.compile(r"^/trabajos/([0-9a-f]{32})$")
+RUTA_EXCEL = re.compile(r"^/trabajos/([0-9a-f]{32})/excel$")
+
+# =========================
+# 1) gestión de trabajos
+# =========================
+class GestorTrabajos:
+    """
+    Mantiene el pool de workers y el registro de trabajos en memoria.
+    El pool se calienta al arrancar para que el primer examen no pague la
+    creación de hilos.
+    """
+
+    def __init__(self, pipeline, workers: int, max_cola: int, max_trabajos: int):
+        self.pipeline = pipeline
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pipeline")
+        self.max_cola = max_cola
+        self.max_trabajos = max_trabajos
+        self.trabajos = OrderedDict()
+        self.pendientes = 0
+        self.lock = threading.Lock()
+        self._calentar_pool(workers)
+
+    def _calentar_pool(self, workers: int):
+        """Lanza tareas vacías para que el pool cree todos sus hilos ya."""
+        barrera = threading.Barrier(workers + 1)
+        for _ in range(workers):
+            self.pool.submit(barrera.wait)
+        barrera.wait()
+
+    def enviar(self, datos_preguntas: bytes, datos_respuestas: bytes, tema):
+        """Encola un examen. Devuelve el id o None si la cola está llena."""
+        with self.lock:
+            if self.pendientes >= self.max_cola:
+                return None
+            self.pendientes += 1
+            id_trabajo = uuid.uuid4().hex
+            self.trabajos[id_trabajo] = {
+                "estado": "pendiente",
+                "creado": time.time(),
+                "duracion": None,
+                "tiempos": None,
+                "preguntas": None,
+                "error": None,
+                "excel": None,
+            }
+            self._purgar()
+        self.pool.submit(self._ejecutar, id_trabajo, datos_preguntas, datos_respuestas, tema)
+        return id_trabajo
+
+    def _purgar(self):
+        """Descarta los trabajos terminados más antiguos si se supera el máximo."""
+        sobrantes = len(self.trabajos) - self.max_trabajos
+        for id_trabajo in list(self.trabajos):
+            if sobrantes <= 0:
+                break
+            if self.trabajos[id_trabajo]["estado"] in ("completado", "error"):
+                del self.trabajos[id_trabajo]
+                sobrantes -= 1
+
+    def _ejecutar(self, id_trabajo, datos_preguntas, datos_respuestas, tema):
+        trabajo = self.trabajos[id_trabajo]
+        trabajo["estado"] = "procesando"
+        inicio = time.perf_counter()
+        try:
+            df = self.pipeline.procesar(datos_preguntas, datos_respuestas, tema, id_trabajo)
+            buffer = io.BytesIO()
+            self.pipeline.escribir(df, buffer)
+            trabajo["excel"] = buffer.getvalue()
+            trabajo["preguntas"] = len(df)
+            trabajo["tiempos"] = df.attrs.get("tiempos")
+            trabajo["estado"] = "completado"
+        except Exception as e:
+            trabajo["error"] = str(e)
+            trabajo["estado"] = "error"
+            print(f"[API] ❌ Trabajo {id_trabajo}: {e}")
+        finally:
+            trabajo["duracion"] = round(time.perf_counter() - inicio, 3)
+            with self.lock:
+                self.pendientes -= 1
+
+    def obtener(self, id_trabajo):
+        with self.lock:
+            return self.trabajos.get(id_trabajo)
+
+    def cerrar(self):
+        self.pool.shutdown(wait=True)
+
+# =========================
+# 2) handler HTTP
+# =========================
+class ManejadorAPI(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # necesario para Transfer-Encoding: chunked
+    server_version = "TipoTestAPI/1.0"
+
+    # --- límite de peticiones simultáneas ---
+    def _atender(self, metodo):
+        if not self.server.limite.acquire(blocking=False):
+            self._json(HTTPStatus.SERVICE_UNAVAILABLE, {"error": "Servidor saturado, reintenta más tarde"},
+                       cerrar=True)
+            return
+        try:
+            metodo()
+        finally:
+            self.server.limite.release()
+
+    def do_GET(self):
+        self._atender(self._get)
+
+    def do_POST(self):
+        self._atender(self._post)
+
+    # --- rutas ---
+    def _get(self):
+        if self.path == "/salud":
+            gestor = self.server.gestor
+            self._json(HTTPStatus.OK, {
+                "estado": "ok",
+                "pendientes": gestor.pendientes,
+                "trabajos": len(gestor.trabajos),
+            })
+            return
+
+        m = RUTA_TRABAJO.match(self.path)
+        if m:
+            trabajo = self.server.gestor.obtener(m.group(1))
+            if trabajo is None:
+                self._json(HTTPStatus.NOT_FOUND, {"error": "Trabajo no encontrado"})
+                return
+            self._json(HTTPStatus.OK, {
+                "id": m.group(1),
+                "estado": trabajo["estado"],
+                "preguntas": trabajo["preguntas"],
+                "duracion": trabajo["duracion"],
+                "tiempos": trabajo["tiempos"],
+                "error": trabajo["error"],
+            })
+            return
+
+        m = RUTA_EXCEL.match(self.path)
+        if m:
+            trabajo = self.server.gestor.obtener(m.group(1))
+            if trabajo is None:
+                self._json(HTTPStatus.NOT_FOUND, {"error": "Trabajo no encontrado"})
+            elif trabajo["estado"] != "completado":
+                self._json(HTTPStatus.CONFLICT, {"error": f"Trabajo en estado '{trabajo['estado']}'"})
+            else:
+                self._enviar_excel(m.group(1), trabajo["excel"])
+            return
+
+        self._json(HTTPStatus.NOT_FOUND, {"error": "Ruta no encontrada"})
+
+    def _post(self):
+        if self.path != "/trabajos":
+            self._json(HTTPStatus.NOT_FOUND, {"error": "Ruta no encontrada"}, cerrar=True)
+            return
+
+        try:
+            longitud = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            longitud = 0
+        if longitud <= 0 or longitud > MAX_CUERPO:
+            self._json(HTTPStatus.REQUEST_ENTITY_TOO_LARGE if longitud > MAX_CUERPO else HTTPStatus.BAD_REQUEST,
+                       {"error": "Content-Length ausente o demasiado grande"}, cerrar=True)
+            return
+
+        try:
+            cuerpo = json.loads(self.rfile.read(longitud))
+            datos_preguntas = base64.b64decode(cuerpo["preguntas"], validate=True)
+            datos_respuestas = base64.b64decode(cuerpo["respuestas"], validate=True)
+            tema = cuerpo.get("tema")
+        except (ValueError, KeyError, TypeError, binascii.Error) as e:
+            self._json(HTTPStatus.BAD_REQUEST, {"error": f"Cuerpo inválido: {e}"})
+            return
+
+        id_trabajo = self.server.gestor.enviar(datos_preguntas, datos_respuestas, tema)
+        if id_trabajo is None:
+            self._json(HTTPStatus.TOO_MANY_REQUESTS, {"error": "Cola de trabajos llena"})
+            return
+        self._json(HTTPStatus.ACCEPTED, {"id": id_trabajo, "estado": "pendiente"})
+
+    # --- respuestas ---
+    def _json(self, estado, datos, cerrar=False):
+        """
+        `cerrar=True` en las respuestas que no leen el cuerpo de la petición:
+        con keep-alive, ese cuerpo se interpretaría como la siguiente petición.
+        """
+        cuerpo = json.dumps(datos, ensure_ascii=False).encode("utf-8")
+        self.send_response(estado)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        if cerrar:
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def _enviar_excel(self, id_trabajo, excel: bytes):
+        """Envía el xlsx en trozos (chunked) para no duplicarlo en memoria por conexión."""
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", MIME_XLSX)
+        self.send_header("Content-Disposition", f'attachment; filename="examen_{id_trabajo}.xlsx"')
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        vista = memoryview(excel)
+        for inicio in range(0, len(vista), TAM_BLOQUE):
+            trozo = vista[inicio:inicio + TAM_BLOQUE]
+            self.wfile.write(f"{len(trozo):X}\r\n".encode("ascii"))
+            self.wfile.write(trozo)
+            self.wfile.write(b"\r\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, formato, *args):
+        if self.server.verbose:
+            super().log_message(formato, *args)
+
+class ServidorAPI(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, direccion, gestor: GestorTrabajos, max_concurrentes: int, verbose: bool = False):
+        super().__init__(direccion, ManejadorAPI)
+        self.gestor = gestor
+        self.limite = threading.BoundedSemaphore(max_concurrentes)
+        self.verbose = verbose
+
+# =========================
+# 3) CLI
+# =========================
+def main():
+    parser = argparse.ArgumentParser(description="Servidor HTTP para procesar exámenes PDF.")
+    parser.add_argument("--host", default="127.0.0.1", help="Dirección de escucha (por defecto 127.0.0.1)")
+    parser.add_argument("--puerto", type=int, default=8000, help="Puerto de escucha (por defecto 8000)")
+    parser.add_argument("--workers", type=int, default=4, help="Hilos del pool de procesamiento")
+    parser.add_argument("--max-concurrentes", type=int, default=32,
+                        help="Peticiones HTTP atendidas a la vez; el resto recibe 503")
+    parser.add_argument("--max-cola", type=int, default=64,
+                        help="Trabajos pendientes máximos; el resto recibe 429")
+    parser.add_argument("--max-trabajos", type=int, default=256,
+                        help="Trabajos terminados que se conservan en memoria")
+    parser.add_argument("--verbose", action="store_true", help="Registrar cada petición HTTP")
+    args = parser.parse_args()
+
+    gestor = GestorTrabajos(crear_pipeline(estricto=True), args.workers, args.max_cola, args.max_trabajos)
+    servidor = ServidorAPI((args.host, args.puerto), gestor, args.max_concurrentes, args.verbose)
+    print(f"[API] 🚀 Escuchando en http://{args.host}:{args.puerto} ({args.workers} workers)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        print("\n[API] Deteniendo servidor...")
+    finally:
+        servidor.server_close()
+        gestor.cerrar()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""Tests del estimador de salida y del troceado de exámenes (pipeline.py)."""
+
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("fitz")
+pytest.importorskip("pandas")
+pytest.importorskip("openai")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pipeline  # noqa: E402
+from pipeline import (  # noqa: E402
+    CHARS_POR_TOKEN,
+    TOKENS_POR_ENTRADA,
+    AclaracionesOpenAI,
+    estimar_tokens_salida,
+    obtener_respuestas,
+    trocear_examen,
+)
+
+def texto_respuestas(n, largo=700):
+    """Texto con n respuestas: "antes i" / patrón "i B" / "despues i ..."."""
+    partes = []
+    for i in range(1, n + 1):
+        partes.append(f"antes {i}")
+        partes.append(f"     {i}      B")
+        partes.append(f"despues {i} " + "x" * largo)
+    return "\n".join(partes)
+
+def test_estimar_usa_la_media_para_preguntas_sin_bloque():
+    bloques = {1: "x" * 350, 2: "x" * 700}
+    preguntas = [(1,), (2,), (3,)]
+    esperado = sum(int(c / CHARS_POR_TOKEN) + TOKENS_POR_ENTRADA for c in (350, 700, 525))
+    assert estimar_tokens_salida(preguntas, bloques) == esperado
+
+def test_trozos_suman_el_total_y_no_superan_el_presupuesto():
+    texto = texto_respuestas(20)
+    _, bloques = obtener_respuestas(texto)
+    del bloques[7]  # pregunta con patrón pero sin bloque: cuenta como la media
+    preguntas = [(i,) for i in range(1, 21)]
+    presupuesto = 1000
+
+    trozos = trocear_examen(texto, preguntas, bloques, presupuesto)
+
+    assert len(trozos) > 1
+    assert all(estimados <= presupuesto for _, _, estimados in trozos)
+    assert sum(estimados for _, _, estimados in trozos) == estimar_tokens_salida(preguntas, bloques)
+    assert [n for numeros, _, _ in trozos for n in numeros] == list(range(1, 21))
+
+def test_trozos_incluyen_el_texto_de_los_vecinos():
+    texto = texto_respuestas(20)
+    _, bloques = obtener_respuestas(texto)
+    trozos = trocear_examen(texto, [(i,) for i in range(1, 21)], bloques, 1000)
+
+    for numeros, trozo, _ in trozos:
+        primera, ultima = numeros[0], numeros[-1]
+        assert f"antes {primera}\n" in trozo + "\n"
+        assert f"despues {ultima} " in trozo
+        if primera > 1:
+            # desde el patrón de la anterior: incluye su "después"
+            assert f"     {primera - 1}      B" in trozo
+        if ultima < 20:
+            # hasta justo antes del patrón de la siguiente: incluye su "antes"
+            assert f"antes {ultima + 1}" in trozo
+            assert f"     {ultima + 1}      B" not in trozo
+
+def test_sin_preguntas_no_hay_trozos_ni_llamadas():
+    texto = texto_respuestas(99, largo=600)
+    _, bloques = obtener_respuestas(texto)
+    assert trocear_examen(texto, [], bloques, 12000) == []
+
+    backend = AclaracionesOpenAI(api_key="test")
+    backend.client = None  # cualquier llamada fallaría
+    assert backend(texto, [], bloques=bloques) == {}
+
+def _respuesta(contenido, finish_reason):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=contenido), finish_reason=finish_reason)],
+        usage=SimpleNamespace(prompt_tokens=10, completion_tokens=20),
+    )
+
+def test_respuesta_truncada_se_reintenta_con_el_maximo(monkeypatch):
+    monkeypatch.setenv("LLM_TRAZAS_MUESTREO", "0")
+    llamadas = []
+
+    def create(**kwargs):
+        llamadas.append(kwargs["max_tokens"])
+        if len(llamadas) == 1:
+            return _respuesta('{"1": "corta', "length")
+        return _respuesta('{"1": "completa"}', "stop")
+
+    backend = AclaracionesOpenAI(api_key="test", max_tokens=16000)
+    backend.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    texto = texto_respuestas(1, largo=100)
+    _, bloques = obtener_respuestas(texto)
+
+    assert backend(texto, [(1,)], bloques=bloques) == {1: "completa"}
+    assert llamadas[0] == pipeline.MIN_MAX_TOKENS
+    assert llamadas[1] == 16000
+
+def test_procesar_llama_al_parsear_y_mide_todas_las_etapas():
+    vistos = []
+    backend = lambda texto_r, preguntas, id_trabajo=None, bloques=None: {1: "aclaración"}  # noqa: E731
+    p = pipeline.Pipeline(extractor=lambda fuente: fuente, aclaraciones=backend)
+    texto_p = "1. Enunciado\na) uno\nb) dos\nc) tres\nd) cuatro"
+
+    df = p.procesar(texto_p, texto_respuestas(1, largo=10),
+                    al_parsear=lambda *datos: vistos.append(datos))
+
+    assert len(vistos) == 1 and vistos[0][2][0][0] == 1
+    assert set(df.attrs["tiempos"]) == {"extraccion", "parsing", "aclaraciones"}
+
+def test_preguntas_sin_patron_no_reenvian_el_texto_completo():
+    texto = texto_respuestas(100).replace("     50      B", "     (sin patrón)")
+    _, bloques = obtener_respuestas(texto)
+    assert 100 in bloques  # el patrón admite 1-100, como obtener_preguntas
+    preguntas = [(i,) for i in range(1, 101)]
+
+    trozos = trocear_examen(texto, preguntas, bloques, 12000)
+
+    assert len(trozos) > 1
+    assert all(trozo != texto and 50 not in numeros for numeros, trozo, _ in trozos)
+    assert sorted(n for numeros, _, _ in trozos for n in numeros) == [n for n in range(1, 101) if n != 50]
+
+def _backend_con(respuestas):
+    backend = AclaracionesOpenAI(api_key="test")
+    create = lambda **kwargs: respuestas.pop(0)  # noqa: E731
+    backend.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    return backend
+
+@pytest.mark.parametrize("respuesta", [
+    _respuesta('{"1": "a", "nota": "b"}', "stop"),
+    _respuesta("[1, 2]", "stop"),
+    _respuesta(None, "stop"),
+])
+def test_respuestas_malformadas_no_rompen_el_pipeline(monkeypatch, respuesta):
+    monkeypatch.setenv("LLM_TRAZAS_MUESTREO", "0")
+    avisos = []
+    backend = _backend_con([respuesta])
+    backend.avisar = avisos.append
+    texto = texto_respuestas(1, largo=100)
+    _, bloques = obtener_respuestas(texto)
+
+    assert backend(texto, [(1,)], bloques=bloques) == {}
+    assert len(avisos) == 1
+
+def test_un_directorio_de_trazas_invalido_no_rompe_la_llamada(monkeypatch, tmp_path):
+    import registro_llm
+    monkeypatch.setattr(registro_llm, "_listener", None)
+    monkeypatch.setattr(registro_llm, "_desactivado", False)
+    monkeypatch.setenv("LLM_TRAZAS_MUESTREO", "1")
+    bloqueo = tmp_path / "fichero"
+    bloqueo.write_text("")
+    monkeypatch.setenv("LLM_TRAZAS_DIR", str(bloqueo / "trazas"))  # padre es un fichero
+
+    backend = _backend_con([_respuesta('{"1": "ok"}', "stop")])
+    texto = texto_respuestas(1, largo=100)
+    _, bloques = obtener_respuestas(texto)
+
+    assert backend(texto, [(1,)], bloques=bloques) == {1: "ok"}
+    assert registro_llm._desactivado